@@ -8,6 +8,7 @@ class Settings:
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
     DEBUG = os.getenv("DEBUG", "True").lower() == "true"
+    WORKERS = int(os.getenv("WORKERS", os.cpu_count() or 1))  # ignored in DEBUG (reload) mode
     
     # Hugging Face Settings
     HF_API_KEY = os.getenv("HF_API_KEY", "")
@@ -16,10 +17,14 @@ class Settings:
     # Document Processing
     MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10485760))  # 10MB
     SUPPORTED_FORMATS = ["pdf", "docx", "txt", "doc"]
+    EXTRACTION_CACHE_BYTES = int(os.getenv("EXTRACTION_CACHE_BYTES", 67108864))  # 64MB of text per worker
     
     # Quiz Generation
     DEFAULT_QUESTION_COUNT = int(os.getenv("DEFAULT_QUESTION_COUNT", 10))
     MIN_QUESTION_COUNT = int(os.getenv("MIN_QUESTION_COUNT", 3))
     MAX_QUESTION_COUNT = int(os.getenv("MAX_QUESTION_COUNT", 50))
+    QUIZ_CACHE_SIZE = int(os.getenv("QUIZ_CACHE_SIZE", 128))
+    # Generation processes per server worker; by default the CPUs are shared between workers
+    QUIZ_WORKERS = int(os.getenv("QUIZ_WORKERS", max(1, (os.cpu_count() or 1) // (1 if DEBUG else WORKERS))))
 
 settings = Settings()
\ No newline at end of file
@@ -1,14 +1,46 @@
-import PyPDF2
+import pypdf
 import docx
 from docx import Document
 import io
 import re
+import hashlib
+import threading
+from cachetools import LRUCache
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# PyMuPDF does not support multithreaded use, and extraction runs in worker
+# threads, so all PyMuPDF calls are serialized
+_PYMUPDF_LOCK = threading.Lock()
+
+_WS_RE = re.compile(r'\s+')
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s\.\,\!\?\-\:\;]')
 
 class DocumentProcessor:
     """Process various document formats and extract text"""
     
     SUPPORTED_FORMATS = ["pdf", "docx", "txt", "doc"]
     
+    def __init__(self, cache_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize document processor
+        
+        Args:
+            cache_bytes: Total size of extracted text to keep, keyed by content
+                hash (measured in characters, roughly bytes for most text)
+        """
+        self._cache = LRUCache(maxsize=cache_bytes, getsizeof=len)
+        self._cache_lock = threading.Lock()
+        self._handlers = {
+            "pdf": self._extract_from_pdf,
+            "docx": self._extract_from_word,
+            "txt": self._extract_from_txt,
+            "doc": self._extract_from_word,
+        }
+    
     def extract_text(self, content: bytes, filename: str) -> str:
         """
         Extract text from various document formats
@@ -20,61 +52,68 @@ class DocumentProcessor:
         Returns:
             Extracted text
         """
-        file_extension = filename.split('.')[-1].lower()
+        file_extension = filename.rpartition('.')[2].lower()
+        
+        # Re-uploads of the same document skip extraction entirely
+        cache_key = (file_extension, hashlib.sha256(content).digest())
+        with self._cache_lock:
+            cached_text = self._cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
         
         try:
-            if file_extension == "pdf":
-                return self._extract_from_pdf(content)
-            elif file_extension == "docx":
-                return self._extract_from_docx(content)
-            elif file_extension in ["txt"]:
-                return content.decode('utf-8', errors='ignore')
-            elif file_extension == "doc":
-                return self._extract_from_doc(content)
-            else:
+            handler = self._handlers.get(file_extension)
+            if handler is None:
                 raise ValueError(f"Unsupported file format: {file_extension}")
+            text = handler(content)
         except Exception as e:
             raise Exception(f"Error processing {filename}: {str(e)}")
+        
+        # A text larger than the whole cache cannot be stored
+        if len(text) <= self._cache.maxsize:
+            with self._cache_lock:
+                self._cache[cache_key] = text
+        return text
     
     def _extract_from_pdf(self, content: bytes) -> str:
-        """Extract text from PDF"""
+        """Extract text from PDF (PyMuPDF, falling back to pypdf)"""
+        if pymupdf is not None:
+            try:
+                with _PYMUPDF_LOCK, pymupdf.open(stream=content, filetype="pdf") as doc:
+                    return "\n".join(page.get_text("text") for page in doc)
+            except Exception as e:
+                print(f"PyMuPDF failed, falling back to pypdf: {str(e)}")
+        
         try:
             pdf_file = io.BytesIO(content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
+            pdf_reader = pypdf.PdfReader(pdf_file)
+            parts = []
             for page in pdf_reader.pages:
-                text += page.extract_text()
-            return text
+                parts.append(page.extract_text() or "")
+            return "".join(parts)
         except Exception as e:
             raise Exception(f"Error reading PDF: {str(e)}")
     
-    def _extract_from_docx(self, content: bytes) -> str:
-        """Extract text from DOCX"""
-        try:
-            doc_file = io.BytesIO(content)
-            doc = Document(doc_file)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return text
-        except Exception as e:
-            raise Exception(f"Error reading DOCX: {str(e)}")
+    def _extract_from_txt(self, content: bytes) -> str:
+        """Extract text from TXT"""
+        return content.decode('utf-8', errors='ignore')
     
-    def _extract_from_doc(self, content: bytes) -> str:
+    def _extract_from_word(self, content: bytes) -> str:
         """
-        Extract text from DOC (using python-docx for legacy format)
+        Extract text from DOCX and DOC (using python-docx for legacy format)
         Note: For better DOC support, consider using python-pptx or other libraries
         """
         try:
             doc_file = io.BytesIO(content)
             doc = Document(doc_file)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return text
+            return "\n".join(paragraph.text for paragraph in doc.paragraphs)
         except Exception as e:
-            raise Exception(f"Error reading DOC: {str(e)}")
+            raise Exception(f"Error reading Word document: {str(e)}")
     
     def clean_text(self, text: str) -> str:
         """Clean extracted text"""
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WS_RE.sub(' ', text)
         # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\-\:\;]', '', text)
+        text = _SPECIAL_CHARS_RE.sub('', text)
         return text.strip()
\ No newline at end of file
@@ -1,16 +1,27 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import json
+from fastapi.responses import ORJSONResponse
+import orjson
 import asyncio
+import os
 from typing import List
 import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from cachetools import LRUCache
 from document_processor import DocumentProcessor
 from quiz_generator import QuizGenerator
 from config import settings
 from utils import ValidationUtils, FileUtils, LoggingUtils
 
-app = FastAPI(title="Quiz Generator API", version="1.0.0")
+app = FastAPI(
+    title="Quiz Generator API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -21,9 +32,119 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-document_processor = DocumentProcessor()
+document_processor = DocumentProcessor(cache_bytes=settings.EXTRACTION_CACHE_BYTES)
 quiz_generator = QuizGenerator()
 
+# Generated quizzes keyed by (text hash, generation options)
+quiz_cache = LRUCache(maxsize=settings.QUIZ_CACHE_SIZE)
+
+
+def _create_quiz_pool() -> ProcessPoolExecutor:
+    """
+    Create the worker pool for quiz generation
+    
+    Workers are not forked from this process directly: it already runs
+    threads (the extraction executor), and forking a multithreaded process
+    can deadlock the child on a lock held at fork time.
+    
+    Returns:
+        Process pool for quiz generation
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(
+        max_workers=settings.QUIZ_WORKERS,
+        mp_context=multiprocessing.get_context(method)
+    )
+
+
+# Quiz generation is CPU-bound, so it runs outside the event loop
+quiz_pool = _create_quiz_pool()
+
+
+async def _run_quiz_generation(**kwargs):
+    """
+    Generate a quiz in the worker pool
+    
+    A worker that dies (e.g. killed for memory) breaks the whole pool, so
+    the pool is replaced and the generation retried once on the new one.
+    
+    Args:
+        kwargs: Arguments for QuizGenerator.generate
+    
+    Returns:
+        Generated quiz in columnar form
+    """
+    global quiz_pool
+    loop = asyncio.get_running_loop()
+    call = partial(quiz_generator.generate, **kwargs)
+    
+    pool = quiz_pool
+    try:
+        return await loop.run_in_executor(pool, call)
+    except BrokenProcessPool:
+        # Concurrent requests may see the same broken pool; replace it once
+        if quiz_pool is pool:
+            print("Quiz worker pool broke, starting a new one")
+            quiz_pool = _create_quiz_pool()
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    return await loop.run_in_executor(quiz_pool, call)
+
+
+@app.on_event("shutdown")
+def shutdown_quiz_pool():
+    """Stop quiz generation worker processes"""
+    quiz_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_upload_size(file: UploadFile) -> int:
+    """
+    Get the size of an uploaded file without reading it into memory
+    
+    Args:
+        file: Uploaded file
+    
+    Returns:
+        File size in bytes
+    """
+    if file.size is not None:
+        return file.size
+    if not file.file:
+        return 0
+    
+    # Fall back to seeking the spooled file when no size was reported
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+async def _extract_upload_text(file: UploadFile) -> str:
+    """
+    Read an uploaded file and extract its text in a worker thread
+    
+    PDF parsing itself is serialized inside DocumentProcessor (PyMuPDF is
+    not thread-safe); reads, hashing and other formats still overlap.
+    
+    Args:
+        file: Uploaded file
+    
+    Returns:
+        Extracted text (empty if the file has no content)
+    """
+    content = await file.read()
+    if not content:
+        return ""
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None,
+        document_processor.extract_text,
+        content,
+        file.filename
+    )
+
 
 @app.get("/health")
 async def health_check():
@@ -76,7 +197,7 @@ async def generate_quiz(
             settings.MAX_QUESTION_COUNT
         )
         if not is_valid:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": error_msg}
             )
@@ -84,16 +205,16 @@ async def generate_quiz(
         # Validate difficulty
         is_valid, error_msg = ValidationUtils.validate_difficulty(difficulty)
         if not is_valid:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": error_msg}
             )
         
         # Parse question types
         try:
-            question_types_list = json.loads(question_types)
-        except json.JSONDecodeError:
-            return JSONResponse(
+            question_types_list = orjson.loads(question_types)
+        except orjson.JSONDecodeError:
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": "Invalid JSON format for question_types"}
             )
@@ -101,14 +222,14 @@ async def generate_quiz(
         # Validate question types
         is_valid, error_msg = ValidationUtils.validate_question_types(question_types_list)
         if not is_valid:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": error_msg}
             )
         
         # Validate files
         if not files or len(files) == 0:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": "At least one file must be uploaded"}
             )
@@ -117,61 +238,74 @@ async def generate_quiz(
         for file in files:
             is_valid, error_msg = FileUtils.validate_file(
                 file.filename,
-                len(await file.read()) if file.file else 0
+                _get_upload_size(file)
             )
             if not is_valid:
-                return JSONResponse(
+                return ORJSONResponse(
                     status_code=400,
                     content={"error": f"File '{file.filename}': {error_msg}"}
                 )
-            # Reset file pointer after reading
-            await file.seek(0)
         
         # Extract text from all documents
-        extracted_text = ""
+        extracted_parts = []
         file_count = 0
         
-        for file in files:
-            try:
-                content = await file.read()
-                if not content:
-                    continue
-                
-                text = document_processor.extract_text(content, file.filename)
-                if text and text.strip():
-                    extracted_text += f"\n\n{text}"
-                    file_count += 1
-            except Exception as e:
-                print(f"Error processing file {file.filename}: {str(e)}")
-                return JSONResponse(
+        results = await asyncio.gather(
+            *(_extract_upload_text(file) for file in files),
+            return_exceptions=True
+        )
+        
+        for file, result in zip(files, results):
+            if isinstance(result, Exception):
+                print(f"Error processing file {file.filename}: {str(result)}")
+                return ORJSONResponse(
                     status_code=400,
-                    content={"error": f"Error processing file '{file.filename}': {str(e)}"}
+                    content={"error": f"Error processing file '{file.filename}': {str(result)}"}
                 )
+            
+            if result and result.strip():
+                extracted_parts.append(result)
+                file_count += 1
+        
+        extracted_text = "\n\n".join(extracted_parts)
         
         if not extracted_text.strip():
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": "Could not extract text from any of the uploaded files"}
             )
         
-        # Generate quiz
-        try:
-            quiz = quiz_generator.generate(
-                text=extracted_text,
-                num_questions=question_count,
-                difficulty=difficulty,
-                question_types=question_types_list,
-                include_explanations=include_explanations
-            )
-        except Exception as e:
-            print(f"Error generating quiz: {str(e)}")
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Error generating quiz: {str(e)}"}
-            )
+        # Generate quiz, reusing a previous result for identical input
+        cache_key = (
+            hashlib.sha256(extracted_text.encode('utf-8')).digest(),
+            question_count,
+            difficulty,
+            tuple(question_types_list),
+            include_explanations
+        )
+        quiz = quiz_cache.get(cache_key)
+        
+        if quiz is None:
+            try:
+                quiz = await _run_quiz_generation(
+                    text=extracted_text,
+                    num_questions=question_count,
+                    difficulty=difficulty,
+                    question_types=question_types_list,
+                    include_explanations=include_explanations
+                )
+            except Exception as e:
+                print(f"Error generating quiz: {str(e)}")
+                return ORJSONResponse(
+                    status_code=500,
+                    content={"error": f"Error generating quiz: {str(e)}"}
+                )
+            
+            if quiz:
+                quiz_cache[cache_key] = quiz
         
         if not quiz or len(quiz) == 0:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=500,
                 content={"error": "Failed to generate any questions"}
             )
@@ -187,11 +321,11 @@ async def generate_quiz(
             question_types=question_types_list,
             duration_seconds=duration
         )
-        print(f"Quiz generation log: {json.dumps(log_entry)}")
+        print(f"Quiz generation log: {orjson.dumps(log_entry).decode()}")
         
         return {
             "success": True,
-            "quiz": quiz,
+            "quiz": quiz.to_records(),
             "metadata": {
                 "num_questions": len(quiz),
                 "difficulty": difficulty,
@@ -211,9 +345,9 @@ async def generate_quiz(
                 "duration_seconds": round(duration, 2)
             }
         )
-        print(f"Error log: {json.dumps(error_log)}")
+        print(f"Error log: {orjson.dumps(error_log).decode()}")
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": f"Internal server error: {str(e)}"}
         )
@@ -237,8 +371,8 @@ async def validate_answer(
         Validation result
     """
     try:
-        # Simple string comparison (case-insensitive)
-        is_correct = user_answer.lower().strip() == correct_answer.lower().strip()
+        # Simple string comparison (case-insensitive, as in batch validation)
+        is_correct = user_answer.casefold().strip() == correct_answer.casefold().strip()
         
         return {
             "success": True,
@@ -248,7 +382,7 @@ async def validate_answer(
             "correct_answer": correct_answer
         }
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
@@ -268,12 +402,14 @@ async def batch_validate_answers(request_body: dict):
     try:
         answers = request_body.get("answers", [])
         results = []
+        correct_answers = 0
         
         for answer in answers:
             is_correct = (
-                answer.get("user_answer", "").lower().strip() == 
-                answer.get("correct_answer", "").lower().strip()
+                answer.get("user_answer", "").casefold().strip() == 
+                answer.get("correct_answer", "").casefold().strip()
             )
+            correct_answers += is_correct
             results.append({
                 "question_id": answer.get("question_id"),
                 "is_correct": is_correct
@@ -282,11 +418,11 @@ async def batch_validate_answers(request_body: dict):
         return {
             "success": True,
             "total_questions": len(results),
-            "correct_answers": sum(1 for r in results if r["is_correct"]),
+            "correct_answers": correct_answers,
             "results": results
         }
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
@@ -342,9 +478,9 @@ async def get_question_types():
 async def general_exception_handler(request, exc):
     """Handle all unhandled exceptions"""
     error_log = LoggingUtils.log_error(str(exc))
-    print(f"Unhandled error: {json.dumps(error_log)}")
+    print(f"Unhandled error: {orjson.dumps(error_log).decode()}")
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"error": "An unexpected error occurred"}
     )
@@ -356,5 +492,6 @@ if __name__ == "__main__":
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else settings.WORKERS
     )
\ No newline at end of file
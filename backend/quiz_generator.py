@@ -1,7 +1,98 @@
-from typing import List, Dict
-import random
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
+from bisect import bisect_right
+from itertools import accumulate
 import json
 import re
+import numpy as np
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# URL stripping scans the whole document, so prefer RE2's linear-time
+# automaton when it is installed. Whitespace is already normalized by
+# _preprocess_text, so RE2's ASCII-only \S matches the same text.
+_URL_RE = (re2 or re).compile(r'http\S+|www\S+')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Generated option lists always hold the answer plus three distractors
+_NUM_OPTIONS = 4
+
+# Random values are drawn for this many chunks per requested question at a
+# time; extra chunks cover those that are too short to yield a question
+_CHUNK_OVERSAMPLE = 3
+
+# Auxiliary and modal verbs mapped to their negated form, used to turn a
+# statement from the text into a false one. do and have are left out: in
+# expository text they are mostly main verbs ("Plants have leaves").
+_NEGATIONS = {
+    "is": "is not", "are": "are not", "was": "was not", "were": "were not",
+    "can": "cannot", "could": "could not", "will": "will not", "would": "would not",
+    "shall": "shall not", "should": "should not", "may": "may not", "might": "might not",
+    "must": "must not",
+}
+
+# Already negated forms mapped back to the affirmative, so a negative
+# statement is made false by dropping its negation
+_AFFIRMATIONS = {
+    "isn't": "is", "aren't": "are", "wasn't": "was", "weren't": "were",
+    "cannot": "can", "can't": "can", "couldn't": "could", "won't": "will",
+    "wouldn't": "would", "shan't": "shall", "shouldn't": "should",
+    "mightn't": "might", "mustn't": "must",
+}
+
+# (type, question, options, correct_answer, explanation)
+Question = Tuple[str, str, Optional[List[str]], str, Optional[str]]
+
+
+@dataclass
+class Chunk:
+    """A chunk of source text with its lead sentence already tokenized"""
+    sentences: List[str]
+    first_sentence_words: List[str]
+
+    @property
+    def first_sentence(self) -> str:
+        return self.sentences[0]
+
+
+@dataclass
+class QuizColumns:
+    """Generated questions stored column-wise; dicts are only built for output"""
+    types: List[str] = field(default_factory=list)
+    questions: List[str] = field(default_factory=list)
+    options: List[Optional[List[str]]] = field(default_factory=list)
+    correct_answers: List[str] = field(default_factory=list)
+    explanations: List[Optional[str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def append(self, question: Question) -> None:
+        """Append one generated question to the columns"""
+        question_type, question_text, options, correct_answer, explanation = question
+        self.types.append(question_type)
+        self.questions.append(question_text)
+        self.options.append(options)
+        self.correct_answers.append(correct_answer)
+        self.explanations.append(explanation)
+
+    def to_records(self) -> List[Dict]:
+        """Materialize the quiz as a list of question dicts for the API response"""
+        records = []
+        for question_type, question_text, options, correct_answer, explanation in zip(
+            self.types, self.questions, self.options, self.correct_answers, self.explanations
+        ):
+            record = {"type": question_type, "question": question_text}
+            if options is not None:
+                record["options"] = options
+            record["correct_answer"] = correct_answer
+            record["explanation"] = explanation
+            records.append(record)
+        return records
+
 
 class QuizGenerator:
     """Generate quiz questions using simple NLP techniques"""
@@ -17,7 +108,7 @@ class QuizGenerator:
         difficulty: str = "medium",
         question_types: List[str] = None,
         include_explanations: bool = True
-    ) -> List[Dict]:
+    ) -> QuizColumns:
         """
         Generate quiz questions from text
         
@@ -29,7 +120,7 @@ class QuizGenerator:
             include_explanations: Include explanations
         
         Returns:
-            List of quiz questions
+            Quiz questions in columnar form
         """
         if question_types is None:
             question_types = ["mcq", "truefalse", "shortanswer", "fillintheblank"]
@@ -38,27 +129,47 @@ class QuizGenerator:
         text = self._preprocess_text(text)
         
         # Split text into chunks for question generation
-        chunks = self._split_into_chunks(text, chunk_size=500)
+        sentences = self._split_into_sentences(text)
+        spans = self._chunk_spans(sentences, chunk_size=500)
+        
+        if not spans:
+            return QuizColumns()
+        
+        # Visit chunks in random order until enough questions are made. The
+        # other random values (question type, one uniform value per question
+        # and the order its options are shown in) are drawn in blocks from
+        # the same generator, and chunks are only built when visited.
+        rng = np.random.default_rng()
+        order = rng.permutation(len(spans))
+        block_size = num_questions * _CHUNK_OVERSAMPLE
         
-        quiz = []
+        quiz = QuizColumns()
         question_count = 0
         
-        for chunk in chunks:
+        for position, index in enumerate(order):
             if question_count >= num_questions:
                 break
             
-            # Determine question type
-            question_type = random.choice(question_types)
+            slot = position % block_size
+            if slot == 0:
+                types = rng.choice(question_types, size=block_size)
+                draws = rng.random(block_size)
+                option_orders = rng.permuted(np.tile(np.arange(_NUM_OPTIONS), (block_size, 1)), axis=1)
+            
+            start, end = spans[index]
+            chunk = self._make_chunk(sentences[start:end])
+            question_type = types[slot]
+            draw = draws[slot]
             
             # Generate question based on type
             if question_type in ["mcq", "multiple_choice"]:
-                question = self._generate_mcq(chunk, difficulty, include_explanations)
+                question = self._generate_mcq(chunk, draw, option_orders[slot], difficulty, include_explanations)
             elif question_type in ["truefalse", "true_false"]:
-                question = self._generate_truefalse(chunk, difficulty, include_explanations)
+                question = self._generate_truefalse(chunk, draw, difficulty, include_explanations)
             elif question_type in ["shortanswer", "short_answer"]:
-                question = self._generate_shortanswer(chunk, difficulty, include_explanations)
+                question = self._generate_shortanswer(chunk, draw, difficulty, include_explanations)
             elif question_type in ["fillintheblank", "fill_in_the_blank"]:
-                question = self._generate_fillintheblank(chunk, difficulty, include_explanations)
+                question = self._generate_fillintheblank(chunk, draw, option_orders[slot], difficulty, include_explanations)
             else:
                 continue
             
@@ -73,45 +184,54 @@ class QuizGenerator:
         # Remove extra whitespace
         text = ' '.join(text.split())
         # Remove URLs
-        text = re.sub(r'http\S+|www\S+', '', text)
+        text = _URL_RE.sub('', text)
         return text.strip()
     
-    def _split_into_chunks(self, text: str, chunk_size: int = 500) -> List[str]:
-        """Split text into chunks"""
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < chunk_size:
-                current_chunk += sentence + ". "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
+    def _split_into_sentences(self, text: str) -> List[str]:
+        """Split text into sentences"""
+        return [s for s in _SENTENCE_SPLIT_RE.split(text) if s]
+    
+    def _chunk_spans(self, sentences: List[str], chunk_size: int = 500) -> List[Tuple[int, int]]:
+        """Group sentences into chunks, returned as (start, end) sentence index spans"""
+        # offsets[k] is where sentence k starts once sentences are joined
+        # with single spaces. A chunk starting at sentence i takes every
+        # following sentence that ends before offsets[i] + chunk_size, so
+        # its end is found by bisection instead of a per-sentence loop.
+        offsets = list(accumulate((len(s) + 1 for s in sentences), initial=0))
+        spans = []
+        start = 0
         
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        while start < len(sentences):
+            end = bisect_right(offsets, offsets[start] + chunk_size, lo=start + 1) - 1
+            # A sentence longer than chunk_size still forms its own chunk
+            end = max(end, start + 1)
+            spans.append((start, end))
+            start = end
         
-        return chunks
+        return spans
+    
+    def _make_chunk(self, sentences: List[str]) -> Chunk:
+        """Build a chunk, splitting its lead sentence into words once"""
+        return Chunk(
+            sentences=sentences,
+            first_sentence_words=sentences[0].split()
+        )
     
-    def _generate_mcq(self, text: str, difficulty: str, include_explanations: bool) -> Dict:
+    def _generate_mcq(self, chunk: Chunk, draw: float, option_order: np.ndarray, difficulty: str, include_explanations: bool) -> Question:
         """Generate multiple choice question"""
         try:
-            # Extract sentences
-            sentences = text.split('. ')
-            if len(sentences) < 2:
+            # Only chunks of at least two sentences give a multiple choice question
+            if len(chunk.sentences) < 2:
                 return None
             
-            # Pick a sentence to base question on
-            sentence = sentences[0]
-            words = sentence.split()
+            sentence = chunk.first_sentence
+            words = chunk.first_sentence_words
             
             if len(words) < 5:
                 return None
             
-            # Select a key word
-            key_word_index = random.randint(1, len(words) - 2)
+            # Select a key word (never the first or last)
+            key_word_index = 1 + int(draw * (len(words) - 2))
             key_word = words[key_word_index]
             
             # Create question
@@ -119,94 +239,112 @@ class QuizGenerator:
             
             # Generate options
             options = [key_word, "Unknown", "Not mentioned", "Different concept"]
-            random.shuffle(options)
+            options = [options[i] for i in option_order]
             
             correct_index = options.index(key_word)
             
-            return {
-                "type": "multiple_choice",
-                "question": question_text,
-                "options": options,
-                "correct_answer": key_word,
-                "explanation": sentence[:150] if include_explanations else None
-            }
+            return (
+                "multiple_choice",
+                question_text,
+                options,
+                key_word,
+                sentence[:150] if include_explanations else None
+            )
         except Exception as e:
             print(f"Error generating MCQ: {str(e)}")
             return None
     
-    def _generate_truefalse(self, text: str, difficulty: str, include_explanations: bool) -> Dict:
+    def _generate_truefalse(self, chunk: Chunk, draw: float, difficulty: str, include_explanations: bool) -> Question:
         """Generate true/false question"""
         try:
-            sentences = text.split('. ')
-            if not sentences[0]:
+            sentence = chunk.first_sentence
+            if not sentence:
                 return None
             
-            sentence = sentences[0]
-            
             # Create a statement and decide if true or false
-            correct_answer = random.choice(['true', 'false'])
+            correct_answer = 'true' if draw < 0.5 else 'false'
             
-            if correct_answer == 'true':
-                question_text = f"True or False: {sentence}"
-            else:
-                # Modify sentence slightly to make it false
-                words = sentence.split()
-                if len(words) > 3:
-                    words[0] = "NOT " + words[0]
-                question_text = f"True or False: {' '.join(words)}"
-            
-            return {
-                "type": "true_false",
-                "question": question_text,
-                "correct_answer": correct_answer,
-                "explanation": sentence[:150] if include_explanations else None
-            }
+            question_text = f"True or False: {sentence}"
+            
+            if correct_answer == 'false':
+                negated_words = self._negate(chunk.first_sentence_words)
+                if negated_words is None:
+                    # Nothing to negate, so keep the statement true
+                    correct_answer = 'true'
+                else:
+                    question_text = f"True or False: {' '.join(negated_words)}"
+            
+            return (
+                "true_false",
+                question_text,
+                None,
+                correct_answer,
+                sentence[:150] if include_explanations else None
+            )
         except Exception as e:
             print(f"Error generating True/False: {str(e)}")
             return None
     
-    def _generate_shortanswer(self, text: str, difficulty: str, include_explanations: bool) -> Dict:
+    def _negate(self, words: List[str]) -> Optional[List[str]]:
+        """
+        Negate a statement at its first auxiliary or modal verb
+        
+        Only lowercase tokens are matched: a capitalized one is either the
+        start of a question or a name or month ("Will Smith", "In May").
+        
+        Args:
+            words: Words of the statement
+        
+        Returns:
+            Words of the negated statement, or None if nothing can be negated
+        """
+        for i, word in enumerate(words):
+            word = word.replace('\u2019', "'")
+            if word in _AFFIRMATIONS:
+                return words[:i] + [_AFFIRMATIONS[word]] + words[i + 1:]
+            if word in _NEGATIONS:
+                if i + 1 < len(words) and words[i + 1] == "not":
+                    # Already negated ("is not"), so drop the negation
+                    return words[:i + 1] + words[i + 2:]
+                return words[:i] + [_NEGATIONS[word]] + words[i + 1:]
+        return None
+    
+    def _generate_shortanswer(self, chunk: Chunk, draw: float, difficulty: str, include_explanations: bool) -> Question:
         """Generate short answer question"""
         try:
-            sentences = text.split('. ')
-            if not sentences:
-                return None
-            
-            sentence = sentences[0]
+            sentence = chunk.first_sentence
             
-            # Extract key word as answer
-            words = [w for w in sentence.split() if len(w) > 4]
+            # Extract key word as answer, without attached punctuation
+            words = [w.strip('.,!?;:"\'()') for w in chunk.first_sentence_words]
+            words = [w for w in words if len(w) > 4]
             if not words:
                 return None
             
-            correct_answer = random.choice(words)
+            correct_answer = words[int(draw * len(words))]
             question_text = f"What is a key term mentioned in: '{sentence[:80]}...'?"
             
-            return {
-                "type": "short_answer",
-                "question": question_text,
-                "correct_answer": correct_answer,
-                "explanation": sentence[:150] if include_explanations else None
-            }
+            return (
+                "short_answer",
+                question_text,
+                None,
+                correct_answer,
+                sentence[:150] if include_explanations else None
+            )
         except Exception as e:
             print(f"Error generating Short Answer: {str(e)}")
             return None
     
-    def _generate_fillintheblank(self, text: str, difficulty: str, include_explanations: bool) -> Dict:
+    def _generate_fillintheblank(self, chunk: Chunk, draw: float, option_order: np.ndarray, difficulty: str, include_explanations: bool) -> Question:
         """Generate fill in the blank question"""
         try:
-            sentences = text.split('. ')
-            if not sentences:
-                return None
-            
-            sentence = sentences[0]
-            words = sentence.split()
+            sentence = chunk.first_sentence
+            words = chunk.first_sentence_words
             
             if len(words) < 5:
                 return None
             
-            # Select a word to blank out
-            blank_index = random.randint(1, len(words) - 2)
+            # Select a word to blank out (never the first or last)
+            blank_index = 1 + int(draw * (len(words) - 2))
             blank_word = words[blank_index]
             
             # Create sentence with blank
@@ -215,15 +353,15 @@ class QuizGenerator:
             
             # Generate options
             options = [blank_word, "Nothing", "Something", "Anything"]
-            random.shuffle(options)
-            
-            return {
-                "type": "fill_in_the_blank",
-                "question": question_text,
-                "options": options,
-                "correct_answer": blank_word,
-                "explanation": sentence[:150] if include_explanations else None
-            }
+            options = [options[i] for i in option_order]
+            
+            return (
+                "fill_in_the_blank",
+                question_text,
+                options,
+                blank_word,
+                sentence[:150] if include_explanations else None
+            )
         except Exception as e:
             print(f"Error generating Fill in the Blank: {str(e)}")
             return None
\ No newline at end of file
@@ -1,8 +1,88 @@
 import re
 import string
-from typing import List, Dict, Tuple
+import random
+from typing import List, Dict, Iterator, Tuple
 import json
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+_WS_RE = re.compile(r'\s+')
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s\.\,\!\?\-\:\;\(\)\"]')
+# ASCII characters removed by _SPECIAL_CHARS_RE, as a str.translate table
+_SPECIAL_CHARS_TABLE = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128))
+    if not (c.isalnum() or c.isspace() or c in '_.,!?-:;()"')
+))
+# The greedy token patterns backtrack quadratically in re on long tokens
+# without a match; the regex module avoids that when it is installed.
+# Unlike re, regex does not count U+001C-U+001F as whitespace, so tokens
+# exclude them explicitly and both engines remove exactly the same text.
+_TOKEN = r'[^\s\x1c-\x1f]'
+_URL_RE = (regex or re).compile(rf'http{_TOKEN}+|www{_TOKEN}+')
+_EMAIL_RE = (regex or re).compile(rf'{_TOKEN}+@{_TOKEN}+')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+_STOPWORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during',
+    'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
+    'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might',
+    'can', 'it', 'its', 'that', 'this', 'these', 'those', 'as', 'if', 'which'
+})
+
+_HTML_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#39;'
+})
+
+
+def _escape_html(value) -> str:
+    """Escape a value for interpolation into HTML"""
+    return str(value).translate(_HTML_ESCAPE_TABLE)
+
+
+def _clean_text(text: str) -> str:
+    """Collapse whitespace and remove special characters but keep punctuation"""
+    text = _WS_RE.sub(' ', text)
+    # Plain ASCII text takes the much faster str.translate path
+    if text.isascii():
+        text = text.translate(_SPECIAL_CHARS_TABLE)
+    else:
+        text = _SPECIAL_CHARS_RE.sub('', text)
+    return text.strip()
+
+
+def _truncate_text(text: str, max_length: int) -> str:
+    """Truncate text at a word boundary, marking the cut with an ellipsis"""
+    if len(text) <= max_length:
+        return text
+    # Cut at the last space within the limit, or hard-cut if there is none
+    cut = text.rfind(' ', 0, max_length)
+    if cut <= 0:
+        cut = max_length
+    return text[:cut] + '...'
+
+
+# lru_cache bounds the number of entries, not their size, so only
+# question and option sized text is memoized; whole documents are not
+_MEMO_MAX_LENGTH = 512
+_clean_text_cached = lru_cache(maxsize=4096)(_clean_text)
+_truncate_text_cached = lru_cache(maxsize=4096)(_truncate_text)
+
 
 class TextUtils:
     """Utility functions for text processing"""
@@ -18,21 +98,38 @@ class TextUtils:
         Returns:
             Cleaned text
         """
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\-\:\;\(\)\"]', '', text)
-        return text.strip()
+        if len(text) <= _MEMO_MAX_LENGTH:
+            return _clean_text_cached(text)
+        return _clean_text(text)
     
     @staticmethod
     def remove_urls(text: str) -> str:
         """Remove URLs from text"""
-        return re.sub(r'http\S+|www\S+', '', text)
+        return _URL_RE.sub('', text)
     
     @staticmethod
     def remove_emails(text: str) -> str:
         """Remove email addresses from text"""
-        return re.sub(r'\S+@\S+', '', text)
+        return _EMAIL_RE.sub('', text)
+    
+    @staticmethod
+    def strip_urls_and_emails(text: str) -> str:
+        """
+        Remove URLs and email addresses from text in a single pass
+        
+        Works on whitespace-separated tokens instead of running both regexes,
+        so whitespace in the result is normalized to single spaces.
+        
+        Args:
+            text: Source text
+        
+        Returns:
+            Text without URL or email tokens
+        """
+        return ' '.join(
+            token for token in text.split()
+            if not (token.startswith(('http', 'www')) or '@' in token)
+        )
     
     @staticmethod
     def extract_sentences(text: str) -> List[str]:
@@ -45,8 +142,10 @@ class TextUtils:
         Returns:
             List of sentences
         """
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+        # The split consumes all whitespace between sentences, so once the
+        # ends are stripped every piece is already trimmed and non-empty
+        text = text.strip()
+        return _SENTENCE_SPLIT_RE.split(text) if text else []
     
     @staticmethod
     def extract_key_phrases(text: str, num_phrases: int = 5) -> List[str]:
@@ -60,30 +159,29 @@ class TextUtils:
         Returns:
             List of key phrases
         """
-        # Split into words and filter by length
-        words = text.split()
-        # Simple heuristic: longer words are often key terms
-        words = [w for w in words if len(w) > 4 and w not in TextUtils.get_stopwords()]
-        # Remove duplicates while preserving order
+        stopwords = _STOPWORDS
         seen = set()
-        unique_words = []
-        for word in words:
-            if word.lower() not in seen:
-                unique_words.append(word)
-                seen.add(word.lower())
-        
-        return unique_words[:num_phrases]
+        phrases = []
+        
+        # Single pass: keep the first occurrence of each longer non-stopword
+        # (longer words are often key terms) and stop once enough are found
+        for word in text.split():
+            if len(phrases) >= num_phrases:
+                break
+            if len(word) <= 4:
+                continue
+            lowered = word.lower()
+            if lowered in stopwords or lowered in seen:
+                continue
+            seen.add(lowered)
+            phrases.append(word)
+        
+        return phrases
     
     @staticmethod
-    def get_stopwords() -> set:
+    def get_stopwords() -> frozenset:
         """Get common stopwords"""
-        return {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during',
-            'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
-            'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might',
-            'can', 'it', 'its', 'that', 'this', 'these', 'those', 'as', 'if', 'which'
-        }
+        return _STOPWORDS
     
     @staticmethod
     def truncate_text(text: str, max_length: int = 500) -> str:
@@ -97,60 +195,105 @@ class TextUtils:
         Returns:
             Truncated text
         """
-        if len(text) <= max_length:
-            return text
-        return text[:max_length].rsplit(' ', 1)[0] + '...'
+        if len(text) <= _MEMO_MAX_LENGTH:
+            return _truncate_text_cached(text, max_length)
+        return _truncate_text(text, max_length)
+
+
+def _mcq_errors(question: Dict) -> Iterator[str]:
+    options = question.get('options')
+    if not options or len(options) < 2:
+        yield "MCQ must have at least 2 options"
+    if 'correct_answer' not in question:
+        yield "MCQ must have correct_answer"
+
+
+def _true_false_errors(question: Dict) -> Iterator[str]:
+    if question.get('correct_answer') not in ('true', 'false'):
+        yield "True/False question must have correct_answer as 'true' or 'false'"
+
+
+def _short_answer_errors(question: Dict) -> Iterator[str]:
+    if not question.get('correct_answer', '').strip():
+        yield "Short answer must have correct_answer"
+
+
+def _fill_in_the_blank_errors(question: Dict) -> Iterator[str]:
+    options = question.get('options')
+    if not options or len(options) < 2:
+        yield "Fill in the blank must have at least 2 options"
+    if 'correct_answer' not in question:
+        yield "Fill in the blank must have correct_answer"
+
+
+# Per-type checks run after the common ones in QuestionUtils.validate_question
+_QUESTION_VALIDATORS = {
+    'multiple_choice': _mcq_errors,
+    'true_false': _true_false_errors,
+    'short_answer': _short_answer_errors,
+    'fill_in_the_blank': _fill_in_the_blank_errors
+}
+
+
+def _question_errors(question: Dict) -> Iterator[str]:
+    """Lazily yield every validation error for a question"""
+    # Check required fields
+    if 'type' not in question:
+        yield "Question missing 'type' field"
+    question_text = question.get('question')
+    if question_text is None:
+        yield "Question missing 'question' field"
+        question_text = ''
+    
+    # Validate question text
+    if not question_text.strip():
+        yield "Question text is empty"
+    
+    # Validate based on type
+    validator = _QUESTION_VALIDATORS.get(question.get('type', ''))
+    if validator is not None:
+        yield from validator(question)
+
+
+# Difficulty contribution of each question type
+_TYPE_DIFFICULTY = {
+    'true_false': 0.1,
+    'fill_in_the_blank': 0.2,
+    'short_answer': 0.3,
+    'multiple_choice': 0.2
+}
+
+
+_VALID_QUESTION_TYPES = frozenset({
+    'mcq', 'truefalse', 'shortanswer', 'fillintheblank',
+    'multiple_choice', 'true_false', 'short_answer', 'fill_in_the_blank'
+})
 
 
 class QuestionUtils:
     """Utility functions for question generation"""
     
     @staticmethod
-    def validate_question(question: Dict) -> Tuple[bool, List[str]]:
+    def validate_question(question: Dict, collect_errors: bool = True) -> Tuple[bool, List[str]]:
         """
         Validate a generated question
         
         Args:
             question: Question dictionary
+            collect_errors: Report every error; if False, stop at the first one
         
         Returns:
             Tuple of (is_valid, error_messages)
         """
-        errors = []
-        
-        # Check required fields
-        if 'type' not in question:
-            errors.append("Question missing 'type' field")
-        if 'question' not in question:
-            errors.append("Question missing 'question' field")
-        
-        # Validate question text
-        if not question.get('question', '').strip():
-            errors.append("Question text is empty")
-        
-        # Validate based on type
-        question_type = question.get('type', '')
-        
-        if question_type == 'multiple_choice':
-            if 'options' not in question or len(question['options']) < 2:
-                errors.append("MCQ must have at least 2 options")
-            if 'correct_answer' not in question:
-                errors.append("MCQ must have correct_answer")
+        errors = _question_errors(question)
         
-        elif question_type == 'true_false':
-            if question.get('correct_answer') not in ['true', 'false']:
-                errors.append("True/False question must have correct_answer as 'true' or 'false'")
-        
-        elif question_type == 'short_answer':
-            if not question.get('correct_answer', '').strip():
-                errors.append("Short answer must have correct_answer")
-        
-        elif question_type == 'fill_in_the_blank':
-            if 'options' not in question or len(question['options']) < 2:
-                errors.append("Fill in the blank must have at least 2 options")
-            if 'correct_answer' not in question:
-                errors.append("Fill in the blank must have correct_answer")
+        if not collect_errors:
+            first_error = next(errors, None)
+            if first_error is None:
+                return True, []
+            return False, [first_error]
         
+        errors = list(errors)
         return len(errors) == 0, errors
     
     @staticmethod
@@ -192,8 +335,10 @@ class QuestionUtils:
         """
         score = 0.0
         
-        # Length of question affects difficulty
-        question_length = len(question.get('question', '').split())
+        # Length of question affects difficulty; question text is single-spaced,
+        # so words can be counted without splitting
+        question_text = question.get('question', '')
+        question_length = question_text.count(' ') + 1 if question_text else 0
         if question_length < 10:
             score += 0.1
         elif question_length > 30:
@@ -202,14 +347,7 @@ class QuestionUtils:
             score += 0.2
         
         # Type affects difficulty
-        question_type = question.get('type', '')
-        type_difficulty = {
-            'true_false': 0.1,
-            'fill_in_the_blank': 0.2,
-            'short_answer': 0.3,
-            'multiple_choice': 0.2
-        }
-        score += type_difficulty.get(question_type, 0.2)
+        score += _TYPE_DIFFICULTY.get(question.get('type', ''), 0.2)
         
         # Number of options affects difficulty
         num_options = len(question.get('options', []))
@@ -231,20 +369,15 @@ class QuestionUtils:
         if 'options' not in question:
             return question
         
-        import random
-        
-        correct_answer = question.get('correct_answer', '')
-        options = question.get('options', [])
-        
-        # Create mapping of original positions
-        indexed_options = list(enumerate(options))
-        random.shuffle(indexed_options)
-        
-        shuffled_options = [opt for _, opt in indexed_options]
-        new_correct_index = shuffled_options.index(correct_answer)
-        
+        shuffled_options = list(question['options'])
+        random.shuffle(shuffled_options)
         question['options'] = shuffled_options
-        question['correct_answer_index'] = new_correct_index
+        
+        # -1 marks a correct answer that is not among the options
+        try:
+            question['correct_answer_index'] = shuffled_options.index(question.get('correct_answer', ''))
+        except ValueError:
+            question['correct_answer_index'] = -1
         
         return question
 
@@ -255,10 +388,16 @@ class FileUtils:
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt', 'doc'}
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     
+    # Error messages for validate_file, built once
+    _TYPE_ERROR = f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+    _SIZE_ERROR = f"File size exceeds limit. Max size: {round(MAX_FILE_SIZE / (1024 * 1024), 2)}MB"
+    
     @staticmethod
+    @lru_cache(maxsize=512)
     def get_file_extension(filename: str) -> str:
         """Get file extension"""
-        return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        dot_index = filename.rfind('.')
+        return filename[dot_index + 1:].lower() if dot_index >= 0 else ''
     
     @staticmethod
     def is_allowed_file(filename: str) -> bool:
@@ -287,11 +426,11 @@ class FileUtils:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        if not FileUtils.is_allowed_file(filename):
-            return False, f"File type not allowed. Allowed types: {', '.join(FileUtils.ALLOWED_EXTENSIONS)}"
+        if FileUtils.get_file_extension(filename) not in FileUtils.ALLOWED_EXTENSIONS:
+            return False, FileUtils._TYPE_ERROR
         
-        if not FileUtils.is_file_size_valid(file_size):
-            return False, f"File size exceeds limit. Max size: {FileUtils.get_file_size_mb(FileUtils.MAX_FILE_SIZE)}MB"
+        if file_size > FileUtils.MAX_FILE_SIZE:
+            return False, FileUtils._SIZE_ERROR
         
         return True, ""
 
@@ -352,18 +491,28 @@ class ValidationUtils:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        valid_types = {'mcq', 'truefalse', 'shortanswer', 'fillintheblank', 'multiple_choice', 'true_false', 'short_answer', 'fill_in_the_blank'}
-        
         if not question_types:
             return False, "At least one question type must be selected"
         
-        for qtype in question_types:
-            if qtype.lower() not in valid_types:
-                return False, f"Invalid question type: {qtype}"
+        invalid_types = {qtype.lower() for qtype in question_types} - _VALID_QUESTION_TYPES
+        if invalid_types:
+            # Report the first offending entry as the caller spelled it
+            qtype = next(q for q in question_types if q.lower() in invalid_types)
+            return False, f"Invalid question type: {qtype}"
         
         return True, ""
 
 
+@lru_cache(maxsize=1)
+def _format_timestamp(epoch_seconds: int) -> str:
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat(timespec='seconds')
+
+
+def _timestamp() -> str:
+    """Current UTC time in ISO 8601, formatted at most once per second"""
+    return _format_timestamp(int(time.time()))
+
+
 class LoggingUtils:
     """Utility functions for logging"""
     
@@ -389,7 +538,7 @@ class LoggingUtils:
             Log dictionary
         """
         return {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': _timestamp(),
             'num_files': num_files,
             'num_questions': num_questions,
             'difficulty': difficulty,
@@ -411,7 +560,7 @@ class LoggingUtils:
             Log dictionary
         """
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': _timestamp(),
             'status': 'error',
             'error': error_message
         }
@@ -422,12 +571,27 @@ class LoggingUtils:
         return log_entry
 
 
+def _csv_fieldnames(quiz: List[Dict]) -> List[str]:
+    """Get all keys used across the quiz, in first-seen order"""
+    return list(dict.fromkeys(key for question in quiz for key in question))
+
+
+def _csv_row(question: Dict) -> Dict:
+    """Convert list values (e.g. options) to comma-separated strings"""
+    return {
+        key: ', '.join(map(str, value)) if type(value) is list else value
+        for key, value in question.items()
+    }
+
+
 class ExportUtils:
     """Utility functions for exporting quiz data"""
     
     @staticmethod
     def export_to_json(quiz: List[Dict]) -> str:
         """Export quiz to JSON format"""
+        if orjson is not None:
+            return orjson.dumps(quiz, option=orjson.OPT_INDENT_2).decode()
         return json.dumps(quiz, indent=2)
     
     @staticmethod
@@ -441,32 +605,49 @@ class ExportUtils:
         
         output = StringIO()
         
-        # Get all possible keys
-        fieldnames = set()
-        for question in quiz:
-            fieldnames.update(question.keys())
+        writer = csv.DictWriter(output, fieldnames=_csv_fieldnames(quiz), extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(map(_csv_row, quiz))
         
-        fieldnames = sorted(list(fieldnames))
+        return output.getvalue()
+    
+    @staticmethod
+    def iter_csv_rows(quiz: List[Dict]) -> Iterator[str]:
+        """
+        Export quiz to CSV format one line at a time
+        
+        Yields the header and then each row, so large exports can be streamed
+        to the client without holding the whole file in memory.
+        
+        Args:
+            quiz: List of questions
         
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        Returns:
+            Iterator of CSV lines
+        """
+        if not quiz:
+            return
+        
+        import csv
+        from io import StringIO
+        
+        # One small buffer, emptied after every line
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=_csv_fieldnames(quiz), extrasaction='ignore')
         writer.writeheader()
         
         for question in quiz:
-            # Convert lists to strings
-            row = {}
-            for key, value in question.items():
-                if isinstance(value, list):
-                    row[key] = ', '.join(str(v) for v in value)
-                else:
-                    row[key] = value
-            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(_csv_row(question))
         
-        return output.getvalue()
+        yield buffer.getvalue()
     
     @staticmethod
     def export_to_html(quiz: List[Dict]) -> str:
         """Export quiz to HTML format"""
-        html = """
+        parts = ["""
         <html>
         <head>
             <meta charset="UTF-8">
@@ -481,29 +662,30 @@ class ExportUtils:
         </head>
         <body>
             <h1>Quiz</h1>
-        """
+        """]
         
         for i, question in enumerate(quiz, 1):
-            html += f"""
+            parts.append(f"""
             <div class="question">
-                <div class="question-text">Question {i}: {question.get('question', '')}</div>
-                <div class="type">Type: {question.get('type', '')}</div>
-            """
+                <div class="question-text">Question {i}: {_escape_html(question.get('question', ''))}</div>
+                <div class="type">Type: {_escape_html(question.get('type', ''))}</div>
+            """)
             
             if 'options' in question:
-                html += '<div class="options">'
-                for option in question['options']:
-                    html += f'<div class="option">- {option}</div>'
-                html += '</div>'
+                parts.append(
+                    '<div class="options">'
+                    + ''.join(f'<div class="option">- {_escape_html(option)}</div>' for option in question['options'])
+                    + '</div>'
+                )
             
             if 'explanation' in question:
-                html += f'<div class="explanation"><strong>Explanation:</strong> {question["explanation"]}</div>'
+                parts.append(f'<div class="explanation"><strong>Explanation:</strong> {_escape_html(question["explanation"])}</div>')
             
-            html += '</div>'
+            parts.append('</div>')
         
-        html += """
+        parts.append("""
         </body>
         </html>
-        """
+        """)
         
-        return html
\ No newline at end of file
+        return ''.join(parts)
\ No newline at end of file